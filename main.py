@@ -1,12 +1,35 @@
 import os
+import re
 import time
+import base64
+import shutil
+import hashlib
+import socket
+import secrets
 import json
 import requests
 import smtplib
 import random
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import timedelta
+from urllib.parse import urlparse
+from email import policy
+from email.utils import getaddresses
 from email.message import EmailMessage
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:  # orjson is only a speedup; stdlib json reads bytes too
+    _json_loads = json.loads
+
+    def _json_dumps(obj):
+        return json.dumps(obj).encode("utf-8")
 
 # ----------------------
 # Config
@@ -23,82 +46,189 @@ if not EMAIL_SENDER or not EMAIL_APP_PASSWORD:
 # ----------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DOWNLOAD_FOLDER = os.path.join(BASE_DIR, "downloaded_manga")
-HISTORY_FILE = os.path.join(BASE_DIR, "sent_history.json")
+HISTORY_FILE = os.path.join(BASE_DIR, "sent_history.ndjson")
+# Pre-NDJSON history (one JSON list). Merged into HISTORY_FILE when present.
+LEGACY_HISTORY_FILE = os.path.join(BASE_DIR, "sent_history.json")
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+# Only the trending list is cached. at-home/server URLs carry short-lived tokens.
+TRENDING_CACHE_TTL = 60 * 60  # 1 hour
 
 IMAGES_TO_DOWNLOAD = 10 
+# Parallel page downloads. Kept small so we don't trip MangaDex rate limits.
+DOWNLOAD_WORKERS = 5
 BASE_HASHTAGS = "#manga #manhwa #newmanga #mangarecommendation #mangadex #fyp #anime #otaku #hiddenmanga"
 
-# Gmail limit is 25MB. Encoding adds ~33% overhead.
-# We set a safe limit of 18MB for raw files to ensure we don't crash.
-MAX_EMAIL_SIZE_BYTES = 18 * 1024 * 1024  # 18 MB
+# Gmail limit is 25MB. Encoding adds ~33% overhead, so the limit is checked
+# against the base64 size: 24MB encoded is roughly 18MB of raw files.
+MAX_EMAIL_SIZE_BYTES = 24 * 1024 * 1024  # 24 MB
+
+# ----------------------
+# MangaDex API
+# ----------------------
+API_BASE = "https://api.mangadex.org"
+# Fixed query parts, built once; each call only adds what varies.
+TRENDING_PARAMS = {
+    "limit": 50,
+    "order[followedCount]": "desc",
+    "originalLanguage[]": ["ja", "ko"],
+    "contentRating[]": ["safe", "suggestive"]
+}
+CHAPTER_PARAMS = {
+    "translatedLanguage[]": "en", "order[chapter]": "asc", "limit": 100,
+    # Let the server drop chapters we can't download (hosted elsewhere, no pages, not out yet)
+    "includeExternalUrl": 0,
+    "includeEmptyPages": 0,
+    "includeFuturePublishAt": 0,
+}
+
+# One pooled session for every MangaDex call, so the TLS handshake is paid once
+# per host instead of once per request. Also retries rate limits / 5xx.
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "MangaDailyBot/1.0 (github.com/sholyeom-cloud/manga-job)"})
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,  # hand the last response back so status checks still log it
+    ),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
 
-JOKES = [
+# Attachments are base64-encoded straight from disk while sending.
+# 57 raw bytes -> one 76 char base64 line, so chunks stay line aligned.
+ATTACHMENT_CHUNK_BYTES = 57 * 1024
+# Placeholder payload per attachment. The token is random for each message so
+# text taken from MangaDex (title, description) can't contain it.
+ATTACHMENT_MARKER = "@@MANGABOT-ATTACHMENT-{token}-{index}@@"
+SMTP_TIMEOUT = 60  # seconds; without it a stalled server blocks the run forever
+
+# Numbered chapters only ("1", "12.5"); skips oneshots and extras.
+_NUM_RE = re.compile(r"\A\d+(?:\.\d+)?\Z")
+# Anything str.isalnum() rejects; stripped from titles to build the hashtag.
+_NON_ALNUM_RE = re.compile(r"[\W_]+")
+
+JOKES = (
     "Why don't manga characters ever get lost? Because they always follow the plot!",
     "Why did the manga character bring a ladder? To reach the top of the story!",
     "Why do action heroes always scream before fighting? To boost their *plot power level*!",
     "Why did the reincarnated slime get promoted? Because he *absorbed* all the experience!",
     "What do you call an overpowered farmer in an isekai? The final boss with a hoe!",
-]
+)
 
 # ----------------------
 # Logic
 # ----------------------
 def load_history():
-    if os.path.exists(HISTORY_FILE):
-        try:
-            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            print("[WARN] History file is corrupted. Starting fresh.")
-            return []
-    return []
+    # One manga ID per line, appended as we go. Read once per run by main().
+    try:
+        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+            history = set(line.strip() for line in f if line.strip())
+    except FileNotFoundError:
+        history = set()
+    migrate_legacy_history(history)
+    return history
 
-def save_history(sent_id):
-    history = load_history()
+def migrate_legacy_history(history):
+    # Copy IDs from an old sent_history.json that the NDJSON file doesn't have yet,
+    # then rename it so the migration only ever runs once.
+    try:
+        with open(LEGACY_HISTORY_FILE, "rb") as f:
+            legacy = _json_loads(f.read())
+    except FileNotFoundError:
+        return
+    except json.JSONDecodeError:
+        legacy = None
+    if not isinstance(legacy, list) or not all(isinstance(sent_id, str) for sent_id in legacy):
+        print("[WARN] Legacy history file is corrupted. Skipping migration.")
+        return
+    missing = [sent_id for sent_id in legacy if sent_id not in history]
+    if missing:
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write("".join(sent_id + "\n" for sent_id in missing))
+        history.update(missing)
+        print(f"[INFO] Migrated {len(missing)} IDs from {os.path.basename(LEGACY_HISTORY_FILE)}.")
+    try:
+        os.replace(LEGACY_HISTORY_FILE, LEGACY_HISTORY_FILE + ".migrated")
+    except OSError as e:
+        print(f"[WARN] Could not rename legacy history file: {e}")
+
+def save_history(history, sent_id):
     if sent_id not in history:
-        history.append(sent_id)
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(history, f)
+        history.add(sent_id)
+        with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+            f.write(sent_id + "\n")
         print(f"[INFO] Saved {sent_id} to history.")
 
-def get_fresh_trending_manga():
+def trending_cache_path(params):
+    # One file per distinct query, so a change to the params never serves stale results.
+    key = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"trending-{key}.json")
+
+def load_cached_trending(params):
+    path = trending_cache_path(params)
+    try:
+        if time.time() - os.path.getmtime(path) < TRENDING_CACHE_TTL:
+            with open(path, "rb") as f:
+                data = _json_loads(f.read())
+            print("[INFO] Using cached trending list.")
+            return data
+    except (OSError, ValueError):
+        pass
+    return None
+
+def save_cached_trending(params, data):
+    path = trending_cache_path(params)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write then rename, so a crash never leaves a half-written cache file.
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_json_dumps(data))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[WARN] Could not cache trending list: {e}")
+
+def get_fresh_trending_manga(history):
     print("[INFO] Step 1: Searching for NEW & TRENDING Manga/Manhwa...")
-    history = load_history()
     thirty_days_ago = datetime.datetime.now() - timedelta(days=30)
-    date_str = thirty_days_ago.strftime("%Y-%m-%dT%H:%M:%S")
-
-    url = "https://api.mangadex.org/manga"
-    headers = {"User-Agent": "MangaDailyBot/1.0 (github.com/sholyeom-cloud/manga-job)"}
-    params = {
-        "limit": 50,
-        "order[followedCount]": "desc",
-        "createdAtSince": date_str,
-        "includes[]": "cover_art",
-        "originalLanguage[]": ["ja", "ko"],
-        "contentRating[]": ["safe", "suggestive"]
-    }
+    # Day granularity keeps the query (and its cache key) stable within a day.
+    date_str = thirty_days_ago.strftime("%Y-%m-%dT00:00:00")
+
+    url = f"{API_BASE}/manga"
+    params = {**TRENDING_PARAMS, "createdAtSince": date_str}
 
     try:
-        resp = requests.get(url, headers=headers, params=params, timeout=30)
-        if resp.status_code != 200:
-            print(f"[ERROR] MangaDex API Error: {resp.status_code}")
-            return None
+        data = load_cached_trending(params)
+        if data is None:
+            resp = SESSION.get(url, params=params, timeout=30)
+            if resp.status_code != 200:
+                print(f"[ERROR] MangaDex API Error: {resp.status_code}")
+                return None
+
+            data = _json_loads(resp.content)
+            save_cached_trending(params, data)
 
-        data = resp.json()
         for manga in data.get("data", []):
             manga_id = manga["id"]
-            if manga_id not in history:
-                title_attr = manga["attributes"]["title"]
-                title = title_attr.get("en") or next(iter(title_attr.values()), "Unknown Title")
-                tags = manga["attributes"].get("tags", [])
-                genres = [t["attributes"]["name"]["en"] for t in tags if t["type"] == "tag"]
-                desc = manga["attributes"]["description"].get("en", "")
-                
-                print(f"[INFO] Found fresh manga: {title}")
-                return {
-                    "id": manga_id, "title": title, "genres": genres,
-                    "desc": desc[:250] + "..." if desc else "No description."
-                }
+            # Skip already-sent manga before touching any attributes
+            if manga_id in history:
+                continue
+            attrs = manga["attributes"]
+            title_attr = attrs["title"]
+            title = title_attr.get("en") or next(iter(title_attr.values()), "Unknown Title")
+            tags = attrs.get("tags", [])
+            genres = [t["attributes"]["name"]["en"] for t in tags if t["type"] == "tag"]
+            desc = attrs["description"].get("en", "")
+
+            print(f"[INFO] Found fresh manga: {title}")
+            return {
+                "id": manga_id, "title": title, "genres": genres,
+                "desc": desc[:250] + "..." if desc else "No description."
+            }
         print("[INFO] No new manga found (all top results in history).")
         return None
     except Exception as e:
@@ -107,16 +237,15 @@ def get_fresh_trending_manga():
 
 def get_first_chapter(manga_id):
     print(f"[INFO] Step 2: Finding first chapter for ID {manga_id}...")
-    url = "https://api.mangadex.org/chapter"
-    headers = {"User-Agent": "MangaDailyBot/1.0"}
-    params = {"manga": manga_id, "translatedLanguage[]": "en", "order[chapter]": "asc", "limit": 100}
+    url = f"{API_BASE}/chapter"
+    params = {**CHAPTER_PARAMS, "manga": manga_id}
     
     try:
-        resp = requests.get(url, headers=headers, params=params, timeout=30)
-        data = resp.json()
+        resp = SESSION.get(url, params=params, timeout=30)
+        data = _json_loads(resp.content)
         for chapter in data.get("data", []):
-            ch_num = chapter["attributes"].get("chapter", "")
-            if ch_num == "1" or ch_num == "0" or (ch_num and ch_num.replace('.', '', 1).isdigit()):
+            ch_num = chapter["attributes"].get("chapter") or ""
+            if _NUM_RE.match(ch_num):
                 print(f"[INFO] Found Chapter {ch_num} (ID: {chapter['id']})")
                 return chapter
         print("[WARN] No suitable Chapter 1 found.")
@@ -125,46 +254,92 @@ def get_first_chapter(manga_id):
         print(f"[ERROR] Failed in get_first_chapter: {e}")
         return None
 
+# fetch_image result for a page that alone would exceed the email limit.
+# Distinct from None (fetch failed) so download_images stops instead of skipping it.
+_TOO_BIG = object()
+
+def fetch_image(img_url, local_path):
+    # Retry logic
+    for _ in range(2):
+        try:
+            # Stream to disk in 64KB chunks instead of holding the whole page in memory
+            with SESSION.get(img_url, stream=True, timeout=30) as r:
+                if r.status_code == 200:
+                    # Don't pull a page that could never fit in the email
+                    size = int(r.headers.get("Content-Length") or 0)
+                    if size * 4 // 3 > MAX_EMAIL_SIZE_BYTES:
+                        print(f"[WARN] {os.path.basename(local_path)} is too big to email ({size / 1024 / 1024:.2f} MB)")
+                        return _TOO_BIG
+                    r.raw.decode_content = True
+                    with open(local_path, "wb") as f:
+                        shutil.copyfileobj(r.raw, f, 64 * 1024)
+                    return local_path
+        except:
+            time.sleep(1)
+    return None
+
 def download_images(chapter, folder):
     print("[INFO] Step 3: Downloading images...")
     chapter_id = chapter["id"]
-    url = f"https://api.mangadex.org/at-home/server/{chapter_id}"
-    headers = {"User-Agent": "MangaDailyBot/1.0"}
+    url = f"{API_BASE}/at-home/server/{chapter_id}"
 
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = SESSION.get(url, timeout=30)
         if resp.status_code != 200:
             return []
 
-        data = resp.json()
+        data = _json_loads(resp.content)
         base_url = data["baseUrl"]
         hash_code = data["chapter"]["hash"]
         files = data["chapter"]["data"]
         
+        # Start from an empty folder so pages from an earlier chapter never linger
+        shutil.rmtree(folder, ignore_errors=True)
         os.makedirs(folder, exist_ok=True)
         downloaded_paths = []
+        total_size = 0
+        email_full = False
 
-        count = 0
+        jobs = []
         for i, filename in enumerate(files):
-            if count >= IMAGES_TO_DOWNLOAD:
-                break
-            
             img_url = f"{base_url}/data/{hash_code}/{filename}"
             ext = filename.split(".")[-1]
             local_path = os.path.join(folder, f"page_{i+1:02d}.{ext}")
-            
-            # Retry logic
-            for _ in range(2):
-                try:
-                    r = requests.get(img_url, headers=headers, timeout=30)
-                    if r.status_code == 200:
-                        with open(local_path, "wb") as f:
-                            f.write(r.content)
-                        downloaded_paths.append(local_path)
-                        count += 1
-                        break
-                except:
-                    time.sleep(1)
+            jobs.append((img_url, local_path))
+
+        # Resolve the CDN host once so the workers don't all race on a cold DNS lookup.
+        host = urlparse(base_url).hostname
+        try:
+            socket.getaddrinfo(host, 443, proto=socket.IPPROTO_TCP)
+        except OSError as e:
+            print(f"[WARN] Could not pre-resolve {host}: {e}")
+
+        # Fetch pages concurrently, but collect them in page order so a failed
+        # page is replaced by the next one, same as the old sequential loop.
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+            futures = [pool.submit(fetch_image, img_url, local_path) for img_url, local_path in jobs]
+            for future in futures:
+                if email_full or len(downloaded_paths) >= IMAGES_TO_DOWNLOAD:
+                    # Enough pages landed, drop everything not started yet.
+                    future.cancel()
+                    continue
+                path = future.result()
+                if path is _TOO_BIG:
+                    # Stop here rather than leave a gap in the middle of the chapter
+                    print("[WARN] Email size limit reached, not downloading more pages.")
+                    email_full = True
+                    continue
+                if not path:
+                    continue
+                # Stop once the next page would push the email over the limit,
+                # same cut-off send_email applies.
+                size = os.path.getsize(path)
+                if (total_size + size) * 4 // 3 > MAX_EMAIL_SIZE_BYTES:
+                    print("[WARN] Email size limit reached, not downloading more pages.")
+                    email_full = True
+                    continue
+                downloaded_paths.append(path)
+                total_size += size
 
         print(f"[INFO] Successfully downloaded {len(downloaded_paths)} images.")
         return downloaded_paths
@@ -172,40 +347,105 @@ def download_images(chapter, folder):
         print(f"[ERROR] Failed in download_images: {e}")
         return []
 
+def stream_message(smtp, msg, attachments):
+    """Send msg over an open SMTP connection without rendering the images in memory.
+
+    attachments is a list of (marker, path); msg holds each marker as the
+    placeholder payload (see ATTACHMENT_MARKER) of that attachment.
+    The email package renders headers, boundaries and the text part; the image
+    bytes are base64-encoded from disk chunk by chunk during DATA.
+    Returns the refused recipients like SMTP.sendmail; raises if all were refused.
+    """
+    wire = msg.as_bytes(policy=policy.SMTP)
+    markers = [marker.encode() for marker, _ in attachments]
+    # Each placeholder must appear exactly once, or the split below would splice
+    # image bytes into the wrong place. Checked before anything is sent.
+    for marker in markers:
+        if wire.count(marker) != 1:
+            raise ValueError(f"Attachment placeholder {marker.decode()} is not unique in the message")
+
+    # Same address handling as smtplib's send_message: one RCPT per address.
+    from_addr = getaddresses([msg["From"]])[0][1]
+    to_addrs = [addr for _, addr in getaddresses(msg.get_all("To", []))]
+
+    with ExitStack() as stack:
+        # Open every attachment up front so a missing file fails before DATA starts
+        files = [stack.enter_context(open(path, "rb")) for _, path in attachments]
+
+        smtp.ehlo_or_helo_if_needed()
+        code, resp = smtp.mail(from_addr)
+        if code != 250:
+            smtp.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+        refused = {}
+        for addr in to_addrs:
+            code, resp = smtp.rcpt(addr)
+            if code not in (250, 251):
+                refused[addr] = (code, resp)
+        if len(refused) == len(to_addrs):
+            smtp.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        smtp.putcmd("data")
+        code, resp = smtp.getreply()
+        if code != 354:
+            raise smtplib.SMTPDataError(code, resp)
+
+        try:
+            for marker, f in zip(markers, files):
+                head, wire = wire.split(marker, 1)
+                # Dot-stuff the rendered text; base64 lines never start with "."
+                smtp.send(re.sub(rb"(?m)^\.", b"..", head))
+                sep = b""
+                for chunk in iter(lambda: f.read(ATTACHMENT_CHUNK_BYTES), b""):
+                    smtp.send(sep + base64.encodebytes(chunk).rstrip(b"\n").replace(b"\n", b"\r\n"))
+                    sep = b"\r\n"
+            smtp.send(re.sub(rb"(?m)^\.", b"..", wire))
+            if not wire.endswith(b"\r\n"):
+                smtp.send(b"\r\n")
+            smtp.send(b".\r\n")
+        except BaseException:
+            # Mid-DATA the server would read QUIT as message body and never
+            # answer it, so drop the connection instead of quitting cleanly.
+            smtp.close()
+            raise
+        code, resp = smtp.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+    return refused
+
 def send_email(manga_info, image_paths):
     print("[INFO] Step 4: preparing Email...")
     
     # --- SIZE CHECK LOGIC START ---
     loaded_images = []
     total_size = 0
-    
-    print("[INFO] loading images to check size...")
+
+    print("[INFO] checking image sizes...")
+    sizes = []
     for path in image_paths:
         try:
-            with open(path, "rb") as f:
-                img_data = f.read()
-                size = len(img_data)
-                filename = os.path.basename(path)
-                loaded_images.append({"name": filename, "data": img_data, "size": size, "path": path})
-                total_size += size
-        except Exception as e:
+            sizes.append((path, os.path.getsize(path)))
+        except OSError as e:
             print(f"[WARN] Failed to load {path}: {e}")
 
-    print(f"[INFO] Initial Total Size: {total_size / 1024 / 1024:.2f} MB")
+    # Keep the longest prefix of pages whose base64 size fits the limit.
+    for path, size in sizes:
+        if (total_size + size) * 4 // 3 > MAX_EMAIL_SIZE_BYTES:
+            break
+        loaded_images.append({"name": os.path.basename(path), "size": size, "path": path})
+        total_size += size
 
-    # While total size > 18MB, remove the last image
-    while total_size > MAX_EMAIL_SIZE_BYTES and len(loaded_images) > 0:
-        removed_img = loaded_images.pop() # Removes the last one added
-        total_size -= removed_img["size"]
-        print(f"[WARN] ⚠️ Email too large! Removed {removed_img['name']}. New size: {total_size / 1024 / 1024:.2f} MB")
+    dropped = len(sizes) - len(loaded_images)
+    if dropped:
+        print(f"[WARN] ⚠️ Email too large! Dropped the last {dropped} image(s). New size: {total_size / 1024 / 1024:.2f} MB")
 
     if not loaded_images:
         print("[ERROR] All images were too big! Cannot send email.")
         return False
     # --- SIZE CHECK LOGIC END ---
 
-    genre_tags = " ".join([f"#{g.replace(' ', '')}" for g in manga_info['genres']])
-    title_tag = "#" + "".join(e for e in manga_info['title'] if e.isalnum())
+    genre_tags = " ".join("#" + g.replace(" ", "") for g in manga_info['genres'])
+    title_tag = "#" + _NON_ALNUM_RE.sub("", manga_info['title'])
     final_hashtags = f"{BASE_HASHTAGS} {genre_tags} {title_tag}"
     joke = random.choice(JOKES)
     
@@ -223,17 +463,24 @@ def send_email(manga_info, image_paths):
     msg["To"] = EMAIL_RECEIVER
     msg.set_content(body)
 
-    # Attach only the images that fit
-    for img in loaded_images:
+    # Attach only the images that fit. The bytes are streamed in stream_message.
+    token = secrets.token_hex(16)
+    attachments = []
+    for i, img in enumerate(loaded_images):
         subtype = img["name"].split(".")[-1].lower()
         if subtype == "jpg": subtype = "jpeg"
-        msg.add_attachment(img["data"], maintype="image", subtype=subtype, filename=img["name"])
+        marker = ATTACHMENT_MARKER.format(token=token, index=i)
+        msg.add_attachment(b"", maintype="image", subtype=subtype, filename=img["name"])
+        msg.get_payload()[-1].set_payload(marker)
+        attachments.append((marker, img["path"]))
 
     try:
         print(f"[INFO] Sending email with size approx {total_size / 1024 / 1024:.2f} MB...")
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
+        with smtplib.SMTP_SSL("smtp.gmail.com", 465, timeout=SMTP_TIMEOUT) as smtp:
             smtp.login(EMAIL_SENDER, EMAIL_APP_PASSWORD)
-            smtp.send_message(msg)
+            refused = stream_message(smtp, msg, attachments)
+        for addr, (code, resp) in refused.items():
+            print(f"[WARN] Recipient {addr} refused: {code} {resp}")
         print("[SUCCESS] Email SENT successfully!")
         return True
     except Exception as e:
@@ -242,25 +489,30 @@ def send_email(manga_info, image_paths):
 
 def main():
     print("--- 🚀 STARTING MANGA BOT 🚀 ---")
-    manga = get_fresh_trending_manga()
+    try:
+        history = load_history()
+        manga = get_fresh_trending_manga(history)
     
-    if manga:
-        chapter = get_first_chapter(manga["id"])
-        if chapter:
-            folder = os.path.join(DOWNLOAD_FOLDER, "temp_chapter")
-            images = download_images(chapter, folder)
+        if manga:
+            chapter = get_first_chapter(manga["id"])
+            if chapter:
+                folder = os.path.join(DOWNLOAD_FOLDER, "temp_chapter")
+                images = download_images(chapter, folder)
             
-            if images:
-                if send_email(manga, images):
-                    save_history(manga["id"])
+                if images:
+                    if send_email(manga, images):
+                        save_history(history, manga["id"])
+                    else:
+                        print("[FAIL] Process finished but Email failed.")
                 else:
-                    print("[FAIL] Process finished but Email failed.")
+                    print("[FAIL] No images downloaded.")
             else:
-                print("[FAIL] No images downloaded.")
+                print("[FAIL] No chapter found.")
         else:
-            print("[FAIL] No chapter found.")
-    else:
-        print("[FAIL] No new manga found.")
+            print("[FAIL] No new manga found.")
+    finally:
+        # Release pooled keep-alive connections
+        SESSION.close()
 
     print("--- 🏁 BOT FINISHED 🏁 ---")
 